@@ -9,15 +9,44 @@ from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from fastapi.templating import Jinja2Templates
 from fastapi.requests import Request
+from transcriber import get_video_duration, find_whisper_implementation, TRANSCRIPTION_STARTED
+from load_policy import LoadPolicy, AdmissionRejected
 
 app = FastAPI()
 
 # Mount templates - use absolute path relative to this script
 templates = Jinja2Templates(directory=os.path.join(os.path.dirname(__file__), "templates"))
 
+# Chooses model sizes and sheds load to keep requests within the latency SLO
+load_policy = LoadPolicy()
+
+# /generate-srt kills the transcriber after this long
+BATCH_TIMEOUT_SECONDS = 300
+
 class TranscriptionRequest(BaseModel):
     url: str
     model_size: str = "medium"
+    allow_downgrade: bool = True
+
+async def admit_request(request: TranscriptionRequest, max_seconds=None):
+    """
+    Estimates how long the request will take and picks the model size to run it with.
+    Raises 503 with Retry-After when the server is too busy, or 422 when even the
+    smallest model can't finish within max_seconds.
+    """
+    loop = asyncio.get_running_loop()
+    audio_duration = await loop.run_in_executor(None, get_video_duration, request.url)
+    try:
+        admission = load_policy.admit(
+            find_whisper_implementation(), request.model_size, audio_duration, request.allow_downgrade,
+            max_seconds
+        )
+    except AdmissionRejected as e:
+        if e.retry_after is None:
+            raise HTTPException(status_code=422, detail=f"{e} Use the streaming endpoint for long videos.")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    print(f"DEBUG: Admission: {admission.to_dict()}", file=sys.stderr)
+    return admission
 
 @app.get("/")
 async def index(request: Request):
@@ -36,6 +65,9 @@ async def generate_srt(request: TranscriptionRequest):
     if not url:
         raise HTTPException(status_code=400, detail="URL is required.")
 
+    # Refuse jobs the subprocess timeout would kill anyway
+    admission = await admit_request(request, max_seconds=BATCH_TIMEOUT_SECONDS)
+
     try:
         # Check if transcriber.py exists
         transcriber_path = os.path.join(os.path.dirname(__file__), 'transcriber.py')
@@ -44,27 +76,51 @@ async def generate_srt(request: TranscriptionRequest):
         
         print(f"DEBUG: Running transcriber with URL: {url}", file=sys.stderr)
         print(f"DEBUG: Transcriber path: {transcriber_path}", file=sys.stderr)
-        print(f"DEBUG: Model size: {request.model_size}", file=sys.stderr)
+        print(f"DEBUG: Model size: {admission.model_size}", file=sys.stderr)
         
         # Prepare the command
         command = [
             sys.executable,  # Use the same Python interpreter
             transcriber_path,  # Run the transcriber script with full path
             '--url', url,  # Pass the URL with --url flag
-            '--model-size', request.model_size  # Use selected model size
+            '--model-size', admission.model_size  # Use the model chosen by the load policy
         ]
         
         print(f"DEBUG: Executing command: {' '.join(command)}", file=sys.stderr)
         
         # Spawn a separate Python process for transcription
         # This ensures the model is completely unloaded when the process exits
-        result = subprocess.run(command, 
-        capture_output=True,  # Capture output
-        text=True,  # Return text instead of bytes
-        timeout=300,  # 5 minute timeout
-        cwd=os.path.dirname(__file__)  # Set working directory to app's directory
+        # Run it without blocking the loop so concurrent requests are admitted against each other
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=os.path.dirname(__file__)  # Set working directory to app's directory
         )
         
+        async def read_stderr():
+            # Start the load policy's clock once the download is done
+            lines = []
+            async for line in process.stderr:
+                line_str = line.decode()
+                if line_str.startswith(TRANSCRIPTION_STARTED):
+                    load_policy.start(admission)
+                lines.append(line_str)
+            return ''.join(lines)
+        
+        try:
+            stdout_bytes, stderr_text = await asyncio.wait_for(
+                asyncio.gather(process.stdout.read(), read_stderr()),
+                timeout=BATCH_TIMEOUT_SECONDS
+            )
+            await process.wait()
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise subprocess.TimeoutExpired(command, BATCH_TIMEOUT_SECONDS)
+        
+        result = subprocess.CompletedProcess(command, process.returncode, stdout_bytes.decode(), stderr_text)
+        
         # Check if the process completed successfully
         if result.returncode != 0:
             # Try to parse error from stderr
@@ -88,6 +144,13 @@ async def generate_srt(request: TranscriptionRequest):
             
             output_data = json.loads(stdout_clean)
             
+            stats = output_data.get('stats') or {}
+            load_policy.record(
+                stats.get('implementation'), admission.model_size,
+                stats.get('audio_duration'), stats.get('transcribe_seconds'),
+                stats.get('load_seconds')
+            )
+            
             if not output_data.get('success', False):
                 error_msg = output_data.get('error', 'Transcription failed')
                 raise HTTPException(status_code=500, detail=error_msg)
@@ -98,11 +161,20 @@ async def generate_srt(request: TranscriptionRequest):
             if not srt_content:
                 raise HTTPException(status_code=500, detail="No transcription content generated")
             
+            # Report the model actually used alongside the file
+            headers = {
+                "Content-Disposition": "attachment; filename=transcription.srt",
+                "X-Model-Size": admission.model_size,
+                "X-Requested-Model-Size": admission.requested_model_size
+            }
+            if admission.estimated_seconds is not None:
+                headers["X-Estimated-Seconds"] = str(admission.estimated_seconds)
+            
             # Create a response that the browser will treat as a file download
             return Response(
                 content=srt_content,
                 media_type="text/plain",
-                headers={"Content-Disposition": "attachment; filename=transcription.srt"}
+                headers=headers
             )
             
         except json.JSONDecodeError as e:
@@ -118,6 +190,8 @@ async def generate_srt(request: TranscriptionRequest):
     except Exception as e:
         print(f"ERROR: Unexpected error: {e}", file=sys.stderr)
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
+    finally:
+        load_policy.release(admission)
 
 # --- New Streaming API Route ---
 @app.post('/generate-srt-stream')
@@ -131,6 +205,8 @@ async def generate_srt_stream(request: TranscriptionRequest):
     if not url:
         raise HTTPException(status_code=400, detail="URL is required.")
 
+    admission = await admit_request(request)
+
     async def event_stream():
         try:
             # Check if transcriber.py exists
@@ -141,12 +217,18 @@ async def generate_srt_stream(request: TranscriptionRequest):
             
             yield f"data: {json.dumps({'status': 'starting', 'message': 'Initializing transcription...'})}\n\n"
             
+            if admission.downgraded:
+                message = f"To finish within the latency target, using the {admission.model_size} model instead of {admission.requested_model_size}."
+            else:
+                message = f"Using the {admission.model_size} model."
+            yield f"data: {json.dumps({'status': 'admitted', 'message': message, **admission.to_dict()})}\n\n"
+            
             # Prepare the command for streaming processing
             command = [
                 sys.executable,
                 transcriber_path,
                 '--url', url,
-                '--model-size', request.model_size,
+                '--model-size', admission.model_size,
                 '--streaming'  # New flag for segment-based streaming
             ]
             
@@ -173,6 +255,14 @@ async def generate_srt_stream(request: TranscriptionRequest):
                         if line_str:
                             # Validate JSON before sending
                             data = json.loads(line_str)
+                            if data.get('status') == 'loading_model':
+                                load_policy.start(admission)
+                            elif data.get('status') == 'completed':
+                                load_policy.record(
+                                    data.get('implementation'), admission.model_size,
+                                    data.get('audio_duration'), data.get('transcribe_seconds'),
+                                    data.get('load_seconds')
+                                )
                             yield f"data: {line_str}\n\n"
                     except json.JSONDecodeError:
                         # Skip non-JSON lines (debug output)
@@ -193,6 +283,8 @@ async def generate_srt_stream(request: TranscriptionRequest):
         except Exception as e:
             print(f"ERROR: Streaming error: {e}", file=sys.stderr)
             yield f"data: {json.dumps({'error': f'An unexpected error occurred: {e}'})}\n\n"
+        finally:
+            load_policy.release(admission)
 
     return StreamingResponse(
         event_stream(),
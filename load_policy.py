@@ -0,0 +1,231 @@
+# load_policy.py
+import os
+import math
+import time
+import threading
+
+# Whisper model sizes from smallest to largest
+MODEL_SIZES = ["tiny", "base", "small", "medium", "large"]
+
+# Rough real-time factors (processing seconds per second of audio) used until
+# a model has been measured on this machine. Excludes model loading.
+DEFAULT_RTF = {
+    "openai": {"tiny": 0.1, "base": 0.15, "small": 0.35, "medium": 0.8, "large": 1.6},
+    "mlx": {"tiny": 0.03, "base": 0.05, "small": 0.1, "medium": 0.2, "large": 0.4},
+}
+
+# Rough fixed cost in seconds of loading each model, paid once per request
+DEFAULT_LOAD_SECONDS = {
+    "openai": {"tiny": 2, "base": 3, "small": 6, "medium": 15, "large": 30},
+    "mlx": {"tiny": 1, "base": 1, "small": 2, "medium": 5, "large": 10},
+}
+
+# Weight given to the newest measurement in the moving averages
+RTF_SMOOTHING = 0.3
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request cannot be served within the latency target.
+    retry_after is None when waiting would not help.
+    """
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Admission:
+    """The model chosen for a request and its estimated completion time."""
+
+    def __init__(self, implementation, requested_model_size, model_size,
+                 audio_duration, work_seconds, estimated_seconds):
+        self.implementation = implementation
+        self.requested_model_size = requested_model_size
+        self.model_size = model_size
+        self.audio_duration = audio_duration
+        # Processing time of this request alone; the backlog is summed from these
+        self.work_seconds = work_seconds
+        self.remaining_seconds = work_seconds
+        # Backlog ahead of this request plus its own work, for reporting
+        self.estimated_seconds = estimated_seconds
+        # Set once the transcriber has finished downloading and begins loading the model
+        self.started_at = None
+
+    @property
+    def downgraded(self):
+        return self.model_size != self.requested_model_size
+
+    def to_dict(self):
+        return {
+            'requested_model_size': self.requested_model_size,
+            'model_size': self.model_size,
+            'downgraded': self.downgraded,
+            'audio_duration': self.audio_duration,
+            'estimated_seconds': self.estimated_seconds,
+        }
+
+
+class LoadPolicy:
+    """
+    Picks a model size for each request so that it finishes within the latency SLO.
+    Tracks the measured real-time factor and model load time per backend and model,
+    and the estimated work still outstanding for in-flight requests.
+
+    The machine is modelled as a single serial queue: in-flight work drains at one
+    second of work per wall-clock second, from requests whose transcription has
+    started, in the order they started. Concurrent subprocesses share the CPU, so
+    their combined throughput is treated the same as running them one at a time.
+    """
+
+    def __init__(self, slo_seconds=None):
+        if slo_seconds is None:
+            slo_seconds = float(os.getenv("LATENCY_SLO_SECONDS", "300"))
+        self.slo_seconds = slo_seconds
+        self._rtf = {}  # (implementation, model_size) -> measured RTF
+        self._load_seconds = {}  # (implementation, model_size) -> measured load time
+        # Backend the transcriber actually ran with; detection outside it can only guess
+        self._observed_implementation = None
+        self._in_flight = []
+        self._drained_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def real_time_factor(self, implementation, model_size):
+        """Return the measured RTF for a model, or its default until it has been measured."""
+        with self._lock:
+            return self._lookup(self._rtf, DEFAULT_RTF, implementation, model_size)
+
+    def load_seconds(self, implementation, model_size):
+        """Return the measured load time for a model, or its default until it has been measured."""
+        with self._lock:
+            return self._lookup(self._load_seconds, DEFAULT_LOAD_SECONDS, implementation, model_size)
+
+    def estimate_seconds(self, implementation, model_size, audio_duration):
+        """Estimated processing time of one request: model load plus RTF times duration."""
+        with self._lock:
+            return self._estimate_seconds(implementation, model_size, audio_duration)
+
+    @staticmethod
+    def _lookup(measured, defaults, implementation, model_size):
+        value = measured.get((implementation, model_size))
+        if value is not None:
+            return value
+        priors = defaults.get(implementation, defaults["openai"])
+        return priors.get(model_size, priors["medium"])
+
+    def _estimate_seconds(self, implementation, model_size, audio_duration):
+        return (self._lookup(self._load_seconds, DEFAULT_LOAD_SECONDS, implementation, model_size)
+                + audio_duration * self._lookup(self._rtf, DEFAULT_RTF, implementation, model_size))
+
+    def _drain(self, now):
+        """Subtract the time elapsed since the last drain from started requests, oldest first."""
+        elapsed = now - self._drained_at
+        self._drained_at = now
+        running = sorted((a for a in self._in_flight
+                          if a.started_at is not None and a.remaining_seconds),
+                         key=lambda a: a.started_at)
+        for admission in running:
+            if elapsed <= 0:
+                break
+            drained = min(admission.remaining_seconds, elapsed)
+            admission.remaining_seconds -= drained
+            elapsed -= drained
+
+    def _backlog_seconds(self):
+        """Estimated processing time still remaining for in-flight requests."""
+        return sum(a.remaining_seconds for a in self._in_flight
+                   if a.remaining_seconds is not None)
+
+    def admit(self, implementation, model_size, audio_duration, allow_downgrade=True,
+              max_seconds=None):
+        """
+        Choose the largest model no bigger than the requested one whose estimated
+        completion time fits the SLO, and mark the request as in flight.
+        When the server is idle the smallest candidate is always admitted, so long
+        videos still run, unless that would exceed max_seconds, a hard limit such as
+        a subprocess timeout. Once a run has completed, its reported backend replaces
+        the detected implementation. Raises AdmissionRejected, with the number of seconds to
+        wait before retrying, when queued work keeps every model over the SLO, or
+        without one when the smallest model can never finish within max_seconds.
+        """
+        with self._lock:
+            now = time.monotonic()
+            implementation = self._observed_implementation or implementation
+
+            if audio_duration is None:
+                # Nothing to estimate from, so take the request as-is
+                admission = Admission(implementation, model_size, model_size, None, None, None)
+                self._in_flight.append(admission)
+                return admission
+
+            self._drain(now)
+            backlog = self._backlog_seconds()
+            if allow_downgrade and model_size in MODEL_SIZES:
+                candidates = MODEL_SIZES[:MODEL_SIZES.index(model_size) + 1][::-1]
+            else:
+                candidates = [model_size]
+
+            limit = self.slo_seconds if max_seconds is None else min(self.slo_seconds, max_seconds)
+            for candidate in candidates:
+                own_seconds = self._estimate_seconds(implementation, candidate, audio_duration)
+                # Nothing is queued ahead, so waiting can't help; run it with the smallest model
+                fits_alone = (backlog == 0 and candidate == candidates[-1]
+                              and (max_seconds is None or own_seconds <= max_seconds))
+                if backlog + own_seconds <= limit or fits_alone:
+                    admission = Admission(implementation, model_size, candidate, audio_duration,
+                                          own_seconds, round(backlog + own_seconds, 1))
+                    self._in_flight.append(admission)
+                    return admission
+
+            # own_seconds now holds the estimate for the smallest candidate
+            if max_seconds is not None and own_seconds > max_seconds:
+                raise AdmissionRejected(
+                    f"Estimated transcription time with the '{candidates[-1]}' model "
+                    f"({own_seconds:.0f} seconds) exceeds the {max_seconds:.0f} second limit."
+                )
+            # Wait until enough of the backlog drains for it to fit, or all of it when it never fits
+            retry_after = max(1, math.ceil(min(backlog, backlog + own_seconds - limit)))
+            raise AdmissionRejected(
+                f"Server is busy; estimated completion would exceed {self.slo_seconds:.0f} seconds.",
+                retry_after=retry_after,
+            )
+
+    def start(self, admission):
+        """Mark a request's transcription as started, so its work begins to drain."""
+        with self._lock:
+            if admission.started_at is None:
+                now = time.monotonic()
+                self._drain(now)
+                admission.started_at = now
+
+    def release(self, admission):
+        """Remove a finished request from the in-flight set."""
+        with self._lock:
+            self._drain(time.monotonic())
+            if admission in self._in_flight:
+                self._in_flight.remove(admission)
+
+    def record(self, implementation, model_size, audio_duration, transcribe_seconds,
+               load_seconds=None):
+        """
+        Fold a completed transcription into the moving averages for its model.
+        transcribe_seconds should exclude model loading, which is passed separately
+        as load_seconds when the backend can time it.
+        """
+        if not implementation:
+            return
+        key = (implementation, model_size)
+        with self._lock:
+            self._observed_implementation = implementation
+            if audio_duration and transcribe_seconds is not None:
+                self._update(self._rtf, key, transcribe_seconds / audio_duration)
+            if load_seconds is not None:
+                self._update(self._load_seconds, key, load_seconds)
+
+    @staticmethod
+    def _update(averages, key, value):
+        previous = averages.get(key)
+        if previous is None:
+            averages[key] = value
+        else:
+            averages[key] = RTF_SMOOTHING * value + (1 - RTF_SMOOTHING) * previous
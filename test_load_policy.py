@@ -0,0 +1,153 @@
+# test_load_policy.py
+import pytest
+
+import load_policy
+from load_policy import LoadPolicy, AdmissionRejected
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Freeze time.monotonic as seen by load_policy; advance it by setting clock.now."""
+    class Clock:
+        now = 1000.0
+    monkeypatch.setattr(load_policy.time, "monotonic", lambda: Clock.now)
+    return Clock
+
+
+def test_backlog_counts_each_request_once(clock):
+    policy = LoadPolicy(slo_seconds=1000)
+    # small: 6s load + 0.35 * 200s = 76s each
+    estimates = [policy.admit("openai", "small", 200).estimated_seconds for _ in range(3)]
+    assert estimates == [76.0, 152.0, 228.0]
+
+
+def test_release_and_elapsed_time_shrink_backlog(clock):
+    policy = LoadPolicy(slo_seconds=1000)
+    first = policy.admit("openai", "small", 200)
+    policy.admit("openai", "small", 200)
+    policy.release(first)
+    third = policy.admit("openai", "small", 200)
+    assert third.estimated_seconds == 152.0
+
+    # Nothing drains while requests are still downloading
+    clock.now += 50
+    assert policy.estimate_seconds("openai", "small", 200) == 76.0
+    assert policy.admit("openai", "small", 200).estimated_seconds == 228.0
+
+
+def test_started_work_drains_serially_in_start_order(clock):
+    policy = LoadPolicy(slo_seconds=1000)
+    first = policy.admit("openai", "small", 200)
+    second = policy.admit("openai", "small", 200)
+    policy.start(first)
+    policy.start(second)
+
+    # 50s of wall-clock time is 50s of work in total, taken from the first request
+    clock.now += 50
+    assert policy.admit("openai", "small", 200).estimated_seconds == 102.0 + 76.0
+    assert (first.remaining_seconds, second.remaining_seconds) == (26.0, 76.0)
+
+    # The first finishes after 26 more seconds, and the rest goes to the second
+    clock.now += 40
+    policy.release(first)
+    assert second.remaining_seconds == 62.0
+
+
+def test_downgrades_to_largest_model_that_fits(clock):
+    policy = LoadPolicy(slo_seconds=300)
+    first = policy.admit("openai", "large", 120)
+    assert first.model_size == "large"
+    assert first.estimated_seconds == 222.0  # 30s load + 1.6 * 120s
+
+    # 222s backlog: large (222s) and medium (111s) overshoot, small (48s) fits
+    second = policy.admit("openai", "large", 120)
+    assert second.model_size == "small"
+    assert second.downgraded
+    assert second.estimated_seconds == 270.0
+
+
+def test_rejects_with_retry_after_when_backlog_is_too_deep(clock):
+    policy = LoadPolicy(slo_seconds=300)
+    policy.admit("openai", "large", 120)  # 222s backlog
+
+    # tiny: 2s load + 0.1 * 1000s = 102s, fits once 24s of backlog drains
+    with pytest.raises(AdmissionRejected) as excinfo:
+        policy.admit("openai", "tiny", 1000)
+    assert excinfo.value.retry_after == 24
+
+    # medium without downgrade can never fit, so wait for the whole backlog
+    with pytest.raises(AdmissionRejected) as excinfo:
+        policy.admit("openai", "medium", 1000, allow_downgrade=False)
+    assert excinfo.value.retry_after == 222
+
+
+def test_idle_server_admits_long_video_with_smallest_model(clock):
+    policy = LoadPolicy(slo_seconds=300)
+    admission = policy.admit("openai", "large", 6000)
+    assert admission.model_size == "tiny"
+
+    admission = LoadPolicy(slo_seconds=300).admit("openai", "large", 6000, allow_downgrade=False)
+    assert admission.model_size == "large"
+
+
+def test_unknown_duration_is_admitted_as_requested(clock):
+    policy = LoadPolicy(slo_seconds=300)
+    admission = policy.admit("openai", "large", None)
+    assert admission.model_size == "large"
+    assert admission.estimated_seconds is None
+    assert policy.admit("openai", "large", 120).estimated_seconds == 222.0
+
+
+def test_record_updates_moving_averages():
+    policy = LoadPolicy(slo_seconds=300)
+    policy.record("openai", "small", 100, 30, 5)
+    assert policy.real_time_factor("openai", "small") == pytest.approx(0.3)
+    assert policy.load_seconds("openai", "small") == pytest.approx(5)
+
+    policy.record("openai", "small", 100, 60, 10)
+    assert policy.real_time_factor("openai", "small") == pytest.approx(0.3 * 0.6 + 0.7 * 0.3)
+    assert policy.load_seconds("openai", "small") == pytest.approx(0.3 * 10 + 0.7 * 5)
+
+    # Other models and backends keep their defaults
+    assert policy.real_time_factor("openai", "large") == 1.6
+    assert policy.real_time_factor("mlx", "small") == 0.1
+
+
+def test_record_without_load_time_only_updates_rtf():
+    policy = LoadPolicy(slo_seconds=300)
+    policy.record("mlx", "medium", 200, 20, None)
+    assert policy.real_time_factor("mlx", "medium") == pytest.approx(0.1)
+    assert policy.load_seconds("mlx", "medium") == 5
+
+
+def test_admit_uses_backend_reported_by_completed_runs(clock):
+    # Before any run completes, the detected backend is all there is
+    policy = LoadPolicy(slo_seconds=300)
+    assert policy.admit("mlx", "large", 120).implementation == "mlx"
+
+    # Detected as mlx, but the transcriber fell back to openai
+    policy = LoadPolicy(slo_seconds=300)
+    policy.record("openai", "small", 100, 50, 6)
+    admission = policy.admit("mlx", "small", 100)
+    assert admission.implementation == "openai"
+    assert admission.estimated_seconds == 56.0
+
+
+def test_max_seconds_rejects_jobs_that_can_never_finish_in_time(clock):
+    policy = LoadPolicy(slo_seconds=300)
+    # tiny: 2s load + 0.1 * 6000s = 602s, over a 300s hard limit even when idle
+    with pytest.raises(AdmissionRejected) as excinfo:
+        policy.admit("openai", "large", 6000, max_seconds=300)
+    assert excinfo.value.retry_after is None
+
+    # Over the SLO but within the hard limit still runs on an idle server
+    policy = LoadPolicy(slo_seconds=100)
+    assert policy.admit("openai", "large", 1500, max_seconds=300).model_size == "tiny"
+
+
+def test_max_seconds_caps_the_slo_for_queued_work(clock):
+    policy = LoadPolicy(slo_seconds=1000)
+    policy.admit("openai", "large", 120)  # 222s backlog
+
+    # small (6s + 70s) fits the SLO but not a 250s hard limit; tiny (22s) does
+    assert policy.admit("openai", "small", 200, max_seconds=250).model_size == "tiny"
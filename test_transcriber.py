@@ -0,0 +1,66 @@
+# test_transcriber.py
+import json
+import os
+
+import pytest
+
+pytest.importorskip("yt_dlp")
+
+import transcriber
+from load_policy import LoadPolicy
+
+
+class FakeYoutubeDL:
+    """Stands in for yt_dlp.YoutubeDL, writing an empty WAV where the real download would go."""
+
+    def __init__(self, opts):
+        self.opts = opts
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def download(self, urls):
+        with open(self.opts['outtmpl'].replace('%(ext)s', 'wav'), 'wb'):
+            pass
+
+
+def run_streaming(monkeypatch, tmp_path, capsys, failing_chunks):
+    """Run process_youtube_video_streaming over three 30s chunks and return its 'completed' event."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(transcriber.yt_dlp, "YoutubeDL", FakeYoutubeDL)
+    monkeypatch.setattr(transcriber, "get_whisper_implementation", lambda: "openai")
+    monkeypatch.setattr(transcriber, "load_model_timed", lambda implementation, model_size: (None, 1.0))
+    monkeypatch.setattr(transcriber, "split_audio_into_chunks", lambda path, chunk_duration=30: [
+        {'path': f'chunk_{i}.wav', 'start_time': i * 30, 'end_time': (i + 1) * 30, 'chunk_index': i}
+        for i in range(3)
+    ])
+
+    def fake_transcribe(path, model_size, model=None):
+        if path in failing_chunks:
+            raise RuntimeError("decode failed")
+        return {'text': 'hello', 'segments': [{'start': 0, 'end': 1, 'text': 'hello'}]}
+    monkeypatch.setattr(transcriber, "transcribe_with_openai", fake_transcribe)
+
+    assert transcriber.process_youtube_video_streaming("https://youtu.be/x", "large")
+    events = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    return next(event for event in events if event['status'] == 'completed')
+
+
+def test_streaming_stats_cover_only_successful_chunks(monkeypatch, tmp_path, capsys):
+    completed = run_streaming(monkeypatch, tmp_path, capsys, failing_chunks={'chunk_1.wav'})
+    assert completed['audio_duration'] == 60
+    assert completed['load_seconds'] == 1.0
+
+
+def test_streaming_stats_with_all_chunks_failed_do_not_skew_rtf(monkeypatch, tmp_path, capsys):
+    completed = run_streaming(monkeypatch, tmp_path, capsys,
+                              failing_chunks={'chunk_0.wav', 'chunk_1.wav', 'chunk_2.wav'})
+    assert completed['audio_duration'] is None
+
+    policy = LoadPolicy(slo_seconds=300)
+    policy.record(completed['implementation'], completed['model_size'],
+                  completed['audio_duration'], completed['transcribe_seconds'])
+    assert policy.real_time_factor("openai", "large") == 1.6
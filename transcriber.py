@@ -8,6 +8,10 @@ import argparse
 import subprocess
 import math
 import time
+import importlib.util
+
+# Printed to stderr once the audio is downloaded and the model starts loading
+TRANSCRIPTION_STARTED = "INFO: Transcription started"
 
 def get_whisper_implementation():
     """
@@ -35,6 +39,22 @@ def get_whisper_implementation():
     
     return "none"
 
+def find_whisper_implementation():
+    """
+    Same as get_whisper_implementation, but only checks which packages are installed
+    without importing them, so callers outside the transcription process stay light.
+    Returns: 'mlx', 'openai', or 'none'
+    """
+    forced_type = os.getenv("WHISPER_TYPE", "").lower()
+    if forced_type in ["mlx", "openai"]:
+        return forced_type
+    
+    if importlib.util.find_spec("mlx_whisper") is not None:
+        return "mlx"
+    if importlib.util.find_spec("whisper") is not None:
+        return "openai"
+    return "none"
+
 def format_timestamp(seconds):
     """Convert seconds to SRT timestamp format (HH:MM:SS,mmm)"""
     hours = int(seconds // 3600)
@@ -54,6 +74,17 @@ def get_audio_duration(audio_path):
     except:
         return None
 
+def get_video_duration(url):
+    """Get the duration of a YouTube video from its metadata, without downloading it."""
+    try:
+        with yt_dlp.YoutubeDL({'quiet': True, 'noplaylist': True, 'skip_download': True}) as ydl:
+            info = ydl.extract_info(url, download=False)
+        duration = info.get('duration') if info else None
+        return float(duration) if duration else None
+    except Exception as e:
+        print(f"WARNING: Could not read video duration: {e}", file=sys.stderr)
+        return None
+
 def split_audio_into_chunks(audio_path, chunk_duration=30):
     """Split audio file into chunks for real-time processing."""
     chunks = []
@@ -91,6 +122,24 @@ def split_audio_into_chunks(audio_path, chunk_duration=30):
     
     return chunks
 
+def load_mlx_model(model_size="medium"):
+    """Load the MLX-Whisper model into mlx_whisper's cache so transcribe calls reuse it."""
+    import mlx.core as mx
+    from mlx_whisper.transcribe import ModelHolder
+    ModelHolder.get_model(f"mlx-community/whisper-{model_size}", mx.float16)
+
+def load_model_timed(implementation, model_size):
+    """
+    Load the Whisper model up front so its cost isn't counted as transcription time.
+    Returns a tuple: (model, load_seconds), where model is only set for OpenAI Whisper.
+    """
+    load_started = time.monotonic()
+    if implementation == "openai":
+        import whisper
+        return whisper.load_model(model_size), time.monotonic() - load_started
+    load_mlx_model(model_size)
+    return None, time.monotonic() - load_started
+
 def transcribe_with_mlx(audio_path, model_size="medium"):
     """Transcribe audio using MLX-Whisper (Apple Silicon optimized)."""
     import mlx_whisper
@@ -175,11 +224,12 @@ def process_youtube_video_streaming(url, model_size="medium"):
             'progress': 20
         }))
         
-        # Pre-load model for OpenAI Whisper to avoid reloading
-        model = None
-        if implementation == "openai":
-            import whisper
-            model = whisper.load_model(model_size)
+        # Pre-load the model to avoid reloading it for every chunk
+        model, load_seconds = load_model_timed(implementation, model_size)
+        
+        # Only successful chunks count towards the real-time factor, so failures can't skew it
+        transcribed_duration = 0.0
+        transcribe_seconds = 0.0
         
         # Step 4: Process each chunk in real-time
         all_segments = []
@@ -200,12 +250,17 @@ def process_youtube_video_streaming(url, model_size="medium"):
             }))
             
             try:
+                chunk_started = time.monotonic()
+                
                 # Transcribe this chunk immediately
                 if implementation == "mlx":
                     result = transcribe_with_mlx(chunk['path'], model_size)
                 else:
                     result = transcribe_with_openai(chunk['path'], model_size, model)
                 
+                transcribe_seconds += time.monotonic() - chunk_started
+                transcribed_duration += chunk['end_time'] - chunk['start_time']
+                
                 # Process segments from this chunk
                 chunk_segments = []
                 segments = result.get('segments', [])
@@ -269,7 +324,12 @@ def process_youtube_video_streaming(url, model_size="medium"):
             'message': 'Transcription completed successfully!',
             'progress': 100,
             'final_srt': final_srt,
-            'total_segments': len(all_segments)
+            'total_segments': len(all_segments),
+            'implementation': implementation,
+            'model_size': model_size,
+            'audio_duration': transcribed_duration or None,
+            'transcribe_seconds': transcribe_seconds,
+            'load_seconds': load_seconds
         }))
         
         return True
@@ -296,7 +356,8 @@ def process_youtube_video_streaming(url, model_size="medium"):
 def process_youtube_video(url, model_size="medium"):
     """
     Downloads audio from a YouTube URL, transcribes it, and returns the SRT content.
-    Returns a tuple: (success, message_or_srt_content)
+    Returns a tuple: (success, message_or_srt_content, stats)
+    where stats holds the backend, audio duration and transcription time.
     """
     # Use a unique ID for filenames to avoid conflicts if multiple users use the app
     request_id = str(uuid.uuid4())
@@ -309,6 +370,7 @@ def process_youtube_video(url, model_size="medium"):
     output_filename_base = f'audio_{request_id}'
     output_path_template = os.path.join(temp_dir, f'{output_filename_base}.%(ext)s')
     final_wav_path = os.path.join(temp_dir, f'{output_filename_base}.wav')
+    stats = {}
 
     try:
         # --- Step 1: Set up yt-dlp options for WAV extraction ---
@@ -334,13 +396,23 @@ def process_youtube_video(url, model_size="medium"):
 
         # --- Step 3: Auto-detect and use the best Whisper implementation ---
         implementation = get_whisper_implementation()
+        stats['implementation'] = implementation
+        stats['model_size'] = model_size
+        stats['audio_duration'] = get_audio_duration(final_wav_path)
+        
+        if implementation == "none":
+            return (False, "No Whisper implementation found. Please install mlx-whisper or openai-whisper.", stats)
+        
+        print(f"{TRANSCRIPTION_STARTED} ({implementation}, {model_size})", file=sys.stderr, flush=True)
+        model, stats['load_seconds'] = load_model_timed(implementation, model_size)
+        transcribe_started = time.monotonic()
         
         if implementation == "mlx":
             result = transcribe_with_mlx(final_wav_path, model_size)
-        elif implementation == "openai":
-            result = transcribe_with_openai(final_wav_path, model_size)
         else:
-            return (False, "No Whisper implementation found. Please install mlx-whisper or openai-whisper.")
+            result = transcribe_with_openai(final_wav_path, model_size, model)
+        
+        stats['transcribe_seconds'] = time.monotonic() - transcribe_started
 
         # --- Step 4: Generate SRT content in memory ---
         srt_content = []
@@ -355,14 +427,14 @@ def process_youtube_video(url, model_size="medium"):
 
         print("INFO: Transcription complete.", file=sys.stderr)
         
-        return (True, "\n".join(srt_content))
+        return (True, "\n".join(srt_content), stats)
 
     except yt_dlp.utils.DownloadError as e:
         print(f"ERROR: Download failed: {e}", file=sys.stderr)
-        return (False, "Error downloading the video. Please check if the URL is correct and public.")
+        return (False, "Error downloading the video. Please check if the URL is correct and public.", stats)
     except Exception as e:
         print(f"ERROR: An unexpected error occurred: {e}", file=sys.stderr)
-        return (False, f"An internal error occurred: {e}")
+        return (False, f"An internal error occurred: {e}", stats)
     finally:
         # --- Step 5: Clean up the downloaded WAV file ---
         if os.path.exists(final_wav_path):
@@ -388,13 +460,14 @@ def standalone_transcribe(url, model_size="medium"):
     try:
         # Redirect stdout to our buffer during transcription
         with contextlib.redirect_stdout(stdout_buffer):
-            success, result = process_youtube_video(url, model_size)
+            success, result, stats = process_youtube_video(url, model_size)
         
         # Return JSON result
         output = {
             "success": success,
             "result": result if success else result,  # result is either SRT content or error message
-            "error": None if success else result
+            "error": None if success else result,
+            "stats": stats
         }
         
         # Print JSON to stdout (this is what the Flask app will capture)